@@ -20,6 +20,9 @@ class BottomLevelCluster(object):
          
     most_dissimilar : str
         Most dissimilar cluster entry(farthest from centroid).
+
+    tree : BallTree
+        Ball tree over the cluster data, used to search its nearest samples.
     """
     index:int
     data:ndarray
@@ -28,6 +31,7 @@ class BottomLevelCluster(object):
     text:str=None
     lesser_dissimilar:str=None
     most_dissimilar:str=None
+    tree:any=None
 
 
     @property
@@ -27,6 +27,7 @@ class HyperLevelCluster(object):
     label:any
     gamma_d:ndarray
     children:list[BottomLevelCluster]=None
+    squared_gamma_d:ndarray=None
 
 
     def add_child(self, child:BottomLevelCluster) -> None:
@@ -0,0 +1,67 @@
+import numpy as np
+from numpy import ndarray
+from dataclasses import astuple, dataclass
+
+
+@dataclass
+class LevelArrays(object):
+    """
+    Represents a whole level of the cluster tree as contiguous arrays, one row per node.
+
+    Parameters
+    ----------
+    data : ndarray
+        Data of every node of the level.
+
+    labels : ndarray
+        Class label of every node. Only set at the hyperlevel.
+
+    squared_gamma_d : ndarray
+        Squared radius γ(d)² of every node. Only set at the hyperlevel.
+
+    children_offsets : ndarray
+        Offsets of the children of each node inside `children`, in CSR layout.
+        The children of the i-th node are children[children_offsets[i]:children_offsets[i + 1]].
+
+    children : ndarray
+        Indexes of the children of every node at the level below.
+    """
+    data:ndarray
+    labels:ndarray=None
+    squared_gamma_d:ndarray=None
+    children_offsets:ndarray=None
+    children:ndarray=None
+
+
+    def link_mask(self, nodes:ndarray, valid:ndarray, n_subnodes:int) -> ndarray:
+        """
+        Mark, for each row of `nodes`, the subnodes linked to any of its valid nodes.
+
+        Parameters
+        ----------
+        nodes : ndarray
+            Matrix of node indexes of this level, one row per sample.
+
+        valid : ndarray
+            Boolean matrix with the same shape of `nodes` telling which indexes are used.
+
+        n_subnodes : int
+            Number of nodes at the level below.
+
+        Returns
+        ----------
+            ndarray : Boolean matrix of shape (nodes.shape[0], n_subnodes).
+        """
+        rows, columns = np.nonzero(valid)
+        parents = nodes[rows, columns]
+
+        starts = self.children_offsets[parents]
+        counts = self.children_offsets[parents + 1] - starts
+
+        # Position, inside `children`, of every child of every selected parent.
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+        mask = np.zeros((nodes.shape[0], n_subnodes), dtype=bool)
+        mask[np.repeat(rows, counts), self.children[positions]] = True
+
+        return mask
@@ -4,11 +4,25 @@ from infra.utils import create_file_path, create_dataset_folder
 
 
 
+def _to_plain_array(values: ndarray) -> ndarray:
+    values = np.asarray(values)
+    
+    # Labels rarely need more than 32 bits, narrow them when every value fits.
+    if values.dtype.kind in 'iu' and values.dtype.itemsize > 4 and values.size > 0:
+        int32_range = np.iinfo(np.int32)
+        
+        if int32_range.min <= values.min() and values.max() <= int32_range.max:
+            return np.ascontiguousarray(values, dtype=np.int32)
+    
+    return np.ascontiguousarray(values)
+
+
+
 def save_results(hashtag: str, results: ndarray) -> None:
     
     create_dataset_folder(hashtag)
     
-    np.save(create_file_path(hashtag, None, 'result'), results)
+    np.save(create_file_path(hashtag, None, 'result'), _to_plain_array(results), allow_pickle=False)
 
 
 
@@ -21,9 +35,9 @@ def save_groundtruth(hashtag: str, groundtruth: ndarray) -> None:
     
     create_dataset_folder(hashtag)
     
-    np.save(create_file_path(hashtag, None, 'groundtruth'), groundtruth)
+    np.save(create_file_path(hashtag, None, 'groundtruth'), _to_plain_array(groundtruth), allow_pickle=False)
 
 
 
 def read_groundtruth(hashtag: str):
-    return np.load(create_file_path(hashtag, None, 'groundtruth') + '.npy')
\ No newline at end of file
+    return np.load(create_file_path(hashtag, None, 'groundtruth') + '.npy')
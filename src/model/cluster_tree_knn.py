@@ -1,7 +1,9 @@
+import heapq
 import numpy as np
 from numpy import ndarray
+from joblib import Parallel, delayed
 from sklearn.base import BaseEstimator, ClassifierMixin
-from sklearn.neighbors import KNeighborsClassifier
+from sklearn.neighbors import BallTree, NearestNeighbors
 from sklearn.cluster import KMeans, AgglomerativeClustering, DBSCAN
 from scipy.cluster.hierarchy import dendrogram, linkage, ClusterNode
 from scipy.spatial import distance
@@ -11,6 +13,98 @@ import scipy
 from dtos.bottom_level_cluster import BottomLevelCluster
 from dtos.hyper_level_cluster import HyperLevelCluster 
 from dtos.upper_level_cluster import UpperLevelCluster 
+from dtos.level_arrays import LevelArrays
+
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+
+
+def _squared_euclidean_dissimilarities(X:ndarray, rows:ndarray) -> ndarray:
+    """
+    Squared euclidean distances between the given rows of X and every row of X, 
+    expanded as |x - y|² = |x|² + |y|² - 2x·y so the bulk of the work is a single 
+    matrix product.
+    
+    Parameters
+    ----------
+    X : ndarray
+        Data samples.
+
+    rows : ndarray
+        Indexes of the samples the distances are computed from.
+
+    Returns
+    ----------
+        ndarray : Matrix of squared distances of shape (rows.shape[0], X.shape[0]).
+    """
+    squared_norms = np.einsum('ij,ij->i', X, X)
+    squared_distances = squared_norms[rows][:, None] + squared_norms[None, :] - 2.0 * (X[rows] @ X.T)
+    
+    # Rounding may leave tiny negative values, and the distance of a sample to itself must be exactly zero.
+    np.maximum(squared_distances, 0, out=squared_distances)
+    squared_distances[np.arange(rows.shape[0]), rows] = 0
+
+    return squared_distances
+
+
+
+def _squared_distances(A:ndarray, B:ndarray) -> ndarray:
+    """
+    Squared euclidean distances between the rows of A and the rows of B. 
+    Uses the SIMD kernels of SimSIMD when it is installed, and SciPy otherwise.
+    
+    Parameters
+    ----------
+    A : ndarray
+        First set of samples.
+
+    B : ndarray
+        Second set of samples.
+
+    Returns
+    ----------
+        ndarray : Matrix of squared distances of shape (A.shape[0], B.shape[0]).
+    """
+    if simsimd is not None:
+        return np.asarray(simsimd.cdist(A, B, metric='sqeuclidean'))
+    
+    return distance.cdist(A, B, metric='sqeuclidean')
+
+
+
+def _nearest_nodes(distances:ndarray, n_nodes:int) -> ndarray:
+    """
+    Indexes of the n_nodes smallest distances of each row, in no particular order.
+    Ties at the n_nodes-th distance go to the lowest indexes, as in a stable argsort.
+    
+    Parameters
+    ----------
+    distances : ndarray
+        Matrix of distances, one row per sample.
+
+    n_nodes : int
+        Number of nodes to be selected per sample.
+
+    Returns
+    ----------
+        ndarray : Matrix of shape (distances.shape[0], min(n_nodes, distances.shape[1])).
+    """
+    if n_nodes < distances.shape[1]:
+        # Keep every node closer than the n_nodes-th smallest distance, and fill
+        # the remaining places with the lowest indexes tied at that distance.
+        kth_distances = np.partition(distances, n_nodes - 1, axis=1)[:, n_nodes - 1:n_nodes]
+        closer = distances < kth_distances
+        tied = distances == kth_distances
+        
+        missing = n_nodes - np.count_nonzero(closer, axis=1)
+        selected = closer | (tied & (np.cumsum(tied, axis=1) <= missing[:, None]))
+        
+        return np.nonzero(selected)[1].reshape(distances.shape[0], n_nodes)
+    
+    return np.tile(np.arange(distances.shape[1]), (distances.shape[0], 1))
 
 
 
@@ -26,6 +120,9 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
     sigma_nearest_nodes : int, default=5
         Number of nodes be searched in the upper level at prediction.
 
+    n_jobs : int, default=-1
+        Number of threads used to search the nearest samples at prediction. -1 means all processors.
+
     References
     ----------
     Oliveira, E., Roatti, H., Nogueira, M., Basoni, H. e Ciarelli M. (2015). Using the Cluster-based
@@ -44,6 +141,7 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
         metric:callable=distance.euclidean,
         initial_hyperlevel_threshold:float=5,
         sigma_nearest_nodes:int=5,
+        n_jobs:int=-1,
     ):
         super(ClusterTreeKNN, self).__init__()
 
@@ -52,6 +150,7 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
         self.metric = metric
         self.initial_hyperlevel_threshold = initial_hyperlevel_threshold
         self.sigma_nearest_nodes = sigma_nearest_nodes
+        self.n_jobs = n_jobs
 
         self.clusters_masks = clusters_masks
         self.centroids = centroids
@@ -62,6 +161,9 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
         self.Hlevel = None
         self.Plevel = None
 
+        self._levels = None
+        self._hyperlevel_nodes = None
+
 
 
     def fit(
@@ -91,23 +193,36 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
         # with all template documents that are labeled
         # during the process described in Section 4.1.
         # These templates constitute a single level B;
-        remaining_clusters_labels = [label for label in np.unique(self.clusters_masks)]
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        centroids = np.asarray(self.centroids, dtype=np.float32)
+        
+        clusters_labels = np.unique(self.clusters_masks)
         
         self.Blevel = [BottomLevelCluster(
                 i, 
                 X[label == self.clusters_masks], 
                 y[label == self.clusters_masks], 
-                self.centroids[i]
-            ) for i, label in enumerate(remaining_clusters_labels)]
+                centroids[i]
+            ) for i, label in enumerate(clusters_labels)]
+
+        # Centroids are fixed during the whole fit, so the (squared) distance
+        # of every sample to the centroid of its own cluster is computed once.
+        centroids_diffs = X - centroids[np.searchsorted(clusters_labels, self.clusters_masks)]
+        centroids_dissimilarities = np.einsum('ij,ij->i', centroids_diffs, centroids_diffs)
+
+        clusters_rows = [np.flatnonzero(self.clusters_masks == label) for label in clusters_labels]
+        clusters_most_dissimilar_rows = np.array([
+            rows[centroids_dissimilarities[rows].argmax()] for rows in clusters_rows])
+        
+        remaining_clusters = np.ones(clusters_labels.shape[0], dtype=bool)
+        remaining_clusters_mask = np.ones(X.shape[0], dtype=bool)
         
         self.Hlevel = []
         self.Plevel = []
 
-        X_length = X.shape[0]
-
         iter = 0
 
-        while len(remaining_clusters_labels) > 0:
+        while remaining_clusters.any():
             
             # Step 2. 
             # ∀Sl ∈ Ω, extract one of the most dissimilar
@@ -115,33 +230,38 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
             # cal properties of each sample d1 = d: γ(d),
             # ψ(d) and ℓ(d). Then, rank all clusters Sl in
             # descending order of ℓ(.);
-            
-            remaining_clusters_mask = np.isin(self.clusters_masks, remaining_clusters_labels)
-
-            _clusters_masks = self.clusters_masks[remaining_clusters_mask]
             _X = X[remaining_clusters_mask]
             _y = y[remaining_clusters_mask]
-
-            X_length = _X.shape[0]
             
-            most_dissimilars = np.array(
-                [self.Blevel[i].data[np.linalg.norm(self.Blevel[i].data - self.centroids[i], axis=1).argmax()] 
-                for i, _ in enumerate(remaining_clusters_labels)])
+            remaining_clusters_indexes = np.flatnonzero(remaining_clusters)
+            
+            most_dissimilars_rows = clusters_most_dissimilar_rows[remaining_clusters_indexes]
+            most_dissimilars = X[most_dissimilars_rows]
 
             assert(most_dissimilars.shape[0] > 0)
             assert(_X.shape[0] > 0)
 
-            most_dissimilars_indexes = [np.where((_X == m).all(axis=1))[0] for m in most_dissimilars]
-            most_dissimilars_indexes = np.array([dist[0] if len(dist) > 0 else 0 for dist in most_dissimilars_indexes])
-            
-            dissimilarities = np.array([np.linalg.norm(i - j) for i in _X for j in _X]).reshape((X_length, X_length))
+            # Position of each most dissimilar sample inside _X.
+            most_dissimilars_indexes = np.cumsum(remaining_clusters_mask)[most_dissimilars_rows] - 1
+
 
             if np.unique(_y).shape[0] > 1:
                 
-                gamma_d = np.array([dissimilarities[i][_y[i] != _y].min() for i in most_dissimilars_indexes])
-                psi_d = [_X[(_y[i] == _y) & (dissimilarities[i] < gamma_d[k])] for k, i in enumerate(most_dissimilars_indexes)]
-                psi_d_labels = [_y[(_y[i] == _y) & (dissimilarities[i] < gamma_d[k])] for k, i in enumerate(most_dissimilars_indexes)]
-                lambda_d = np.array([len(psi) for psi in psi_d])
+                # One row per most dissimilar sample d, against every sample in _X. 
+                # Distances are only ranked and compared here, so they are kept squared.
+                if self.metric is distance.euclidean:
+                    d_dissimilarities = _squared_euclidean_dissimilarities(_X, most_dissimilars_indexes)
+                else:
+                    d_dissimilarities = distance.cdist(_X[most_dissimilars_indexes], _X, metric=self.metric) ** 2
+                
+                d_same_label = _y[most_dissimilars_indexes][:, None] == _y[None, :]
+
+                squared_gamma_d = np.where(d_same_label, np.inf, d_dissimilarities).min(axis=1)
+                gamma_d = np.sqrt(squared_gamma_d)
+                
+                # Only ψ(.) of the chosen hypernode is kept, so the others are just counted.
+                psi_d_masks = d_same_label & (d_dissimilarities < squared_gamma_d[:, None])
+                lambda_d = np.count_nonzero(psi_d_masks, axis=1)
                 new_hyper_node_index = lambda_d.argmax()
                 
                 # Step 3. 
@@ -156,13 +276,14 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
                     len(self.Hlevel), 
                     most_dissimilars[new_hyper_node_index], 
                     _y[most_dissimilars_indexes[new_hyper_node_index]],
-                    gamma_d[new_hyper_node_index]
+                    gamma_d[new_hyper_node_index],
+                    squared_gamma_d=squared_gamma_d[new_hyper_node_index]
                 )
 
                 self.Hlevel.append(new_hyper_node)
 
-                new_bottol_level_data = psi_d[new_hyper_node_index]
-                new_bottom_level_labels = psi_d_labels[new_hyper_node_index]
+                new_bottol_level_data = _X[psi_d_masks[new_hyper_node_index]]
+                new_bottom_level_labels = _y[psi_d_masks[new_hyper_node_index]]
 
                 new_bottom_level_node = BottomLevelCluster(
                     len(self.Blevel), 
@@ -171,9 +292,10 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
                     None
                 )
                 
-                cluster_to_be_removed = _clusters_masks[most_dissimilars_indexes[new_hyper_node_index]]
+                cluster_to_be_removed = remaining_clusters_indexes[new_hyper_node_index]
                 
-                remaining_clusters_labels.remove(cluster_to_be_removed)
+                remaining_clusters[cluster_to_be_removed] = False
+                remaining_clusters_mask[clusters_rows[cluster_to_be_removed]] = False
                 new_hyper_node.add_child(new_bottom_level_node)
                 
                 self.Blevel.append(new_bottom_level_node)
@@ -182,7 +304,8 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
                     len(self.Hlevel), 
                     most_dissimilars[0], 
                     _y[0],
-                    gamma_d[0]
+                    gamma_d[0],
+                    squared_gamma_d=squared_gamma_d[0]
                 )
 
                 new_bottom_level_node = BottomLevelCluster(len(self.Blevel), _X, _y, None)
@@ -192,7 +315,10 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
 
                 self.Blevel.append(new_bottom_level_node)
                 
-                remaining_clusters_labels.pop()
+                cluster_to_be_removed = remaining_clusters_indexes[-1]
+                
+                remaining_clusters[cluster_to_be_removed] = False
+                remaining_clusters_mask[clusters_rows[cluster_to_be_removed]] = False
 
             # Step 4. 
             # Repeat Step 2 and Step 3 until the Ω set be-
@@ -213,12 +339,23 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
         self.Plevel = self.Hlevel
         iter = 0
 
+        # Every level built below keeps a subset of the hypernodes data, and the
+        # clustering radius does not change, so the ε-neighborhoods are searched once
+        # and each level clusters the matching slice of that graph.
+        hypernodes_data = np.array([cluster.data for cluster in self.Hlevel])
+        hypernodes_rows = np.arange(hypernodes_data.shape[0])
+        
+        hypernodes_neighborhoods = NearestNeighbors(
+                radius=self.initial_hyperlevel_threshold, 
+                algorithm='ball_tree'
+            ).fit(hypernodes_data).radius_neighbors_graph(mode='distance')
+
         while len(self.Plevel) != 1:
-            hyperlevel_data = np.array([cluster.data for cluster in self.Plevel]) 
+            hyperlevel_data = hypernodes_data[hypernodes_rows]
             new_P_level = None
             
             if hyperlevel_data.shape[0] == 2:
-                upper_node = UpperLevelCluster(len(self.Plevel), hyperlevel_data)
+                upper_node = UpperLevelCluster(len(self.Plevel), hyperlevel_data.mean(axis=0))
                 
                 for child in self.Plevel:
                     upper_node.add_child(child)
@@ -231,8 +368,8 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
                 if min_samples < 3:
                     min_samples = 3
                 
-                hyperlevel_clustering = DBSCAN(eps=self.initial_hyperlevel_threshold, min_samples=min_samples)
-                hyperlevel_clustering.fit(hyperlevel_data)
+                hyperlevel_clustering = DBSCAN(eps=self.initial_hyperlevel_threshold, min_samples=min_samples, metric='precomputed')
+                hyperlevel_clustering.fit(hypernodes_neighborhoods[hypernodes_rows][:, hypernodes_rows])
                 
                 if np.unique(hyperlevel_clustering.labels_).shape[0] > 1 and hyperlevel_clustering.core_sample_indices_.shape[0] < hyperlevel_data.shape[0]:
                     new_P_level = []
@@ -245,8 +382,10 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
                             upper_node.add_child(child)
                         
                         new_P_level.append(upper_node)
+
+                    hypernodes_rows = hypernodes_rows[core_indeces]
                 else:
-                    upper_node = UpperLevelCluster(len(self.Plevel), hyperlevel_data)
+                    upper_node = UpperLevelCluster(len(self.Plevel), hyperlevel_data.mean(axis=0))
                     
                     for child in self.Plevel:
                         upper_node.add_child(child)
@@ -263,20 +402,57 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
             iter = iter + 1
             assert(iter < self._max_iter)
 
+        self._cache_levels()
+
         return self
 
 
 
-    def predict(self, sample: ndarray) -> ndarray:
-        if sample.shape[0] > 1:
-            return np.array([self._predict(_sample) for _sample in sample])
-        return self._predict(sample)
+    def _cache_levels(self) -> None:
+        """
+        Store every level of the tree, from P down to the hyperlevel, as
+        contiguous arrays so prediction does not walk the nodes again.
+        
+        Returns
+        ----------
+            None : This function does not return anything.
+        """
+        level = self.Plevel
+        
+        self._levels = []
+
+        while not isinstance(level[0], HyperLevelCluster):
+            subnodes, children_offsets, children = self._link_subnodes(level)
+            
+            self._levels.append(LevelArrays(
+                np.stack([cluster.data for cluster in level]),
+                children_offsets=children_offsets,
+                children=children
+            ))
+
+            level = subnodes
+
+        self._levels.append(LevelArrays(
+            np.stack([cluster.data for cluster in level]),
+            labels=np.array([cluster.label for cluster in level]),
+            squared_gamma_d=np.array([cluster.squared_gamma_d for cluster in level])
+        ))
+
+        # Object array, so the hypernodes of each sample are gathered with one fancy index.
+        self._hyperlevel_nodes = np.empty(len(level), dtype=object)
+        self._hyperlevel_nodes[:] = level
+
+        for node in self._hyperlevel_nodes:
+            for child in node.children:
+                if child.data.shape[0] > 0:
+                    child.tree = BallTree(child.data)
 
 
 
-    def _predict(self, sample: ndarray) -> ndarray:
+    def predict(self, sample: ndarray) -> ndarray:
         """
-        Predict the class labels for the provided data.
+        Predict the class labels for the provided data. All samples descend 
+        the tree together, one level at a time.
         
         Parameters
         ----------
@@ -287,85 +463,142 @@ class ClusterTreeKNN(BaseEstimator, ClassifierMixin):
         ----------
             ndarray : Class labels for each data sample.
         """
+        samples = np.ascontiguousarray(np.atleast_2d(sample), dtype=np.float32)
         
         # Step 1. 
         # First, we compute the dissimilarity between x
         # and each node at the top level of the cluster
         # tree and choose the ς nearest nodes as a node
         # set Lx ;
-        distances = np.array([np.linalg.norm(cluster.data - sample) for cluster in self.Plevel])
-        indexes = distances.argsort()[:self.sigma_nearest_nodes]
-        
-        Lx = np.take(self.Plevel, indexes)
-        
-        assert(Lx.shape[0] > 0)
-
-        iter = 0
-
-        while not any(isinstance(cluster, HyperLevelCluster) for cluster in Lx):
+        distances = _squared_distances(samples, self._levels[0].data)
+        Lx = _nearest_nodes(distances, self.sigma_nearest_nodes)
+        Lx_valid = np.ones(Lx.shape, dtype=bool)
+
+        # Step 3. 
+        # Repeat Step 2 until reaching the hyperlevel
+        # in the tree. When the searching stops at the
+        # hyperlevel, Lx consists of ς hypernodes;
+        for level, sublevel in zip(self._levels, self._levels[1:]):
             
             # Step 2. 
             # Compute the dissimilarity between x and
             # each subnode linked to the nodes in Lx , and
             # again choose the ς nearest nodes, which are
             # used to update the node set Lx ;
-            subnodes = np.array([cluster.children for cluster in Lx]).flatten()
-            distances = np.array([np.linalg.norm(cluster.data - sample) for cluster in subnodes])
-            indexes = distances.argsort()[:self.sigma_nearest_nodes]
+            linked = level.link_mask(Lx, Lx_valid, sublevel.data.shape[0])
 
-            Lx = np.take(subnodes, indexes)
-
-            # Step 3. 
-            # Repeat Step 2 until reaching the hyperlevel
-            # in the tree. When the searching stops at the
-            # hyperlevel, Lx consists of ς hypernodes;
-            iter = iter + 1
-            assert(iter < self._max_iter)
+            distances = _squared_distances(samples, sublevel.data)
+            distances[~linked] = np.inf
+            
+            Lx = _nearest_nodes(distances, self.sigma_nearest_nodes)
+            Lx_valid = np.isfinite(np.take_along_axis(distances, Lx, axis=1))
 
 
         # Step 4. 
         # Search Lx for the hypernode:
         # Lh = {Y |d(y, x) ≤ γ(d), y ∈ Lx }. 
-        #TODO implement conditions
-        # Lh_hyper_nodes = [node for node in Lx]
-        Lh_hyper_nodes = [node for node in Lx if np.linalg.norm(node.data - sample) <= node.gamma_d]
+        hyperlevel = self._levels[-1]
+
+        Lh = Lx_valid & (np.take_along_axis(distances, Lx, axis=1) <= hyperlevel.squared_gamma_d[Lx])
         
-        if len(Lh_hyper_nodes) == 0:
-            Lh_hyper_nodes = Lx
+        empty_Lh = ~Lh.any(axis=1)
+        Lh[empty_Lh] = Lx_valid[empty_Lh]
 
         # If all nodes in Lh have the same class label, then this class is as-
         # sociated with x and the classification process
         # stops; otherwise, go to Step 5;
-        Lh_hyper_node_labels = np.unique(np.array([c.label for c in Lh_hyper_nodes]))
+        Lh_labels = hyperlevel.labels[Lx]
+        results = Lh_labels[np.arange(Lx.shape[0]), Lh.argmax(axis=1)]
         
-        if not len(Lh_hyper_node_labels) > 1:
-            return Lh_hyper_node_labels[0]
-        else:
-            # Step 5. 
-            # Compute the dissimilarity between x and
-            # every subnode linked to the nodes in Lx , and
-            # choose the k nearest samples. Then, take a
-            # majority voting among the k nearest samples
-            # to determine the class label for x.
-            bottom_level_data = []
-            bottom_level_label = []
-
-            for node in Lh_hyper_nodes:
-                for child in node.children:
-                    bottom_level_data.append(child.data)
-                    bottom_level_label.append(child.labels)
-
-            bottom_level_data = np.concatenate(bottom_level_data)
-            bottom_level_label = np.concatenate(bottom_level_label)
-            
-            n_neighbors = self.n_neighbors
+        single_label = ((Lh_labels == results[:, None]) | ~Lh).all(axis=1)
+
+        # The tree is read-only after fit and the ball tree queries release the GIL,
+        # so the remaining samples are searched by threads sharing the same nodes.
+        undecided = np.flatnonzero(~single_label)
+        
+        results[undecided] = Parallel(n_jobs=self.n_jobs, prefer='threads', batch_size=64)(
+            delayed(self._predict_knn)(samples[i], self._hyperlevel_nodes[Lx[i][Lh[i]]]) 
+            for i in undecided)
 
-            if bottom_level_data.shape[0] < n_neighbors:
-                n_neighbors = bottom_level_data.shape[0]
+        return results if np.ndim(sample) > 1 else results[0]
 
-            knn = KNeighborsClassifier(n_neighbors=n_neighbors)
+
+
+    def _link_subnodes(self, level:list) -> tuple[list, ndarray, ndarray]:
+        """
+        Collect the distinct subnodes linked to the nodes of a level.
+        
+        Parameters
+        ----------
+        level : list
+            Nodes of a level of the tree.
+
+        Returns
+        ----------
+            tuple[list, ndarray, ndarray] : The distinct subnodes, followed by the offsets
+            and the subnodes indexes of the children of each node, in CSR layout.
+        """
+        subnodes = []
+        subnodes_positions = {}
+        children = []
+        children_offsets = [0]
+
+        for node in level:
+            for child in node.children:
+                if id(child) not in subnodes_positions:
+                    subnodes_positions[id(child)] = len(subnodes)
+                    subnodes.append(child)
+
+                children.append(subnodes_positions[id(child)])
             
-            knn.fit(bottom_level_data, bottom_level_label)
+            children_offsets.append(len(children))
+
+        return subnodes, np.array(children_offsets, dtype=np.int32), np.array(children, dtype=np.int32)
+
+
+
+    def _predict_knn(self, sample: ndarray, Lh_hyper_nodes: ndarray) -> any:
+        """
+        Predict the class label of a sample by a majority voting among 
+        its nearest samples linked to the given hypernodes.
+        
+        Parameters
+        ----------
+        sample : ndarray
+            Test sample.
+
+        Lh_hyper_nodes : ndarray
+            Hypernodes whose bottom level samples are searched.
+
+        Returns
+        ----------
+            any : Class label of the sample.
+        """
+        
+        # Step 5. 
+        # Compute the dissimilarity between x and
+        # every subnode linked to the nodes in Lx , and
+        # choose the k nearest samples. Then, take a
+        # majority voting among the k nearest samples
+        # to determine the class label for x.
+        neighbors = []
+
+        for node in Lh_hyper_nodes:
+            for child in node.children:
+                if child.tree is None:
+                    continue
+                
+                n_neighbors = min(self.n_neighbors, child.data.shape[0])
+                distances, indexes = child.tree.query([sample], k=n_neighbors)
+                
+                neighbors.extend(
+                    (distance, child.index, index, label) 
+                    for distance, index, label in zip(distances[0], indexes[0], child.labels[indexes[0]]))
+
+        # Ties in distance go to the lowest bottom level node and sample index, 
+        # so the result does not depend on the order of Lh.
+        nearest_neighbors = heapq.nsmallest(self.n_neighbors, neighbors, key=lambda neighbor: neighbor[:3])
+        
+        labels, votes = np.unique([label for *_, label in nearest_neighbors], return_counts=True)
 
-            return knn.predict([sample])[0]
-            
\ No newline at end of file
+        return labels[votes.argmax()]
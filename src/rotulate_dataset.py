@@ -1,3 +1,4 @@
+import sys
 import argparse
 import numpy as np
 from infra.dataset_reader import DatasetReader
@@ -37,6 +38,10 @@ gui = WordCloudUI(clusters=clusters)
 
 gui.show()
 
+# Closing the window without finishing leaves entries unlabeled.
+if not gui.is_fully_labeled():
+    sys.exit('Not every cluster was labeled, the preprocessing results were not saved.')
+
 centroids = [cluster.centroid for cluster in clusters]
 clustering_mask = preprocessor.get_clustering_mask()
 assigned_labels = gui.get_assigned_labels()
@@ -21,8 +21,9 @@ class WordCloudUI(object):
             self._clusters = clusters
             self._cluster_index = 0
             
-            self._lesser_dissimilar_labels = np.tile(1, len(clusters))
-            self._most_dissimilar_labels = np.tile(1, len(clusters))
+            # -1 marks a cluster entry that was not labeled yet.
+            self._lesser_dissimilar_labels = np.full(len(clusters), -1, dtype=np.int8)
+            self._most_dissimilar_labels = np.full(len(clusters), -1, dtype=np.int8)
             
             self.label_options = { 'Negative': 0, 'Neutral': 1, 'Positive': 2 }
 
@@ -69,6 +70,18 @@ class WordCloudUI(object):
 
 
 
+        def is_fully_labeled(self) -> bool:
+            """
+            Check whether both entries of every cluster were labeled.
+            
+            Returns
+            ----------
+                bool : True if no label is left unassigned.
+            """
+            return bool(np.all(self._lesser_dissimilar_labels != -1) and np.all(self._most_dissimilar_labels != -1))
+
+
+
         def _create_graphic_components(self) -> None:
             self._wordcloud = WordCloud(background_color='white', width=600, stopwords=set(STOPWORDS))
             self._fig = plt.figure(num='Cluster Classifier', figsize=(10, 6))
@@ -102,12 +115,16 @@ class WordCloudUI(object):
         def _lesser_rbtn_click(self, label) -> None:
             label_value = self.label_options[label]
             self._lesser_dissimilar_labels[self._cluster_index] = label_value 
+            self._enable_or_disable_components()
+            self._show_title()
 
 
 
         def _most_rbtn_click(self, label) -> None:
             label_value = self.label_options[label]
             self._most_dissimilar_labels[self._cluster_index] = label_value 
+            self._enable_or_disable_components()
+            self._show_title()
     
 
 
@@ -126,12 +143,9 @@ class WordCloudUI(object):
 
 
         def _enable_or_disable_components(self) -> None:
-            can_finish = np.all(self._lesser_dissimilar_labels != -1) == 1
-            can_finish = can_finish and np.all(self._most_dissimilar_labels != -1) == 1
-            
             self._prev_btn.set_active(self._cluster_index > 0)
             self._next_btn.set_active(self._cluster_index < len(self._clusters) - 1)
-            self._fin_btn.set_active(can_finish)
+            self._fin_btn.set_active(self.is_fully_labeled())
 
 
 
@@ -139,12 +153,49 @@ class WordCloudUI(object):
             cluster = self._clusters[self._cluster_index]
             self._image = self._wordcloud.generate(cluster.text).recolor(random_state=2020)
             self._img_axis.imshow(self._image)
-            self._fig.suptitle(cluster.name)
             
             self._most_dissimilar_txtbox.set_val(cluster.most_dissimilar)
             self._lesser_dissimilar_txtbox.set_val(cluster.lesser_dissimilar)
 
-            self._lesser_dis_radiobtn.set_active(self._lesser_dissimilar_labels[self._cluster_index])
-            self._most_dis_radiobtn.set_active(self._most_dissimilar_labels[self._cluster_index])
+            self._show_label(self._lesser_dis_radiobtn, self._lesser_dissimilar_labels[self._cluster_index])
+            self._show_label(self._most_dis_radiobtn, self._most_dissimilar_labels[self._cluster_index])
+            self._show_title()
             
             plt.axis('off')
+
+
+
+        def _show_title(self) -> None:
+            cluster = self._clusters[self._cluster_index]
+            
+            # Radio buttons always show an option, so unassigned entries are named in the title.
+            not_labeled = [
+                entry for entry, labels in [
+                    ('lesser dissimilar', self._lesser_dissimilar_labels), 
+                    ('most dissimilar', self._most_dissimilar_labels)
+                ] if labels[self._cluster_index] == -1]
+            
+            clusters_left = np.count_nonzero((self._lesser_dissimilar_labels == -1) | (self._most_dissimilar_labels == -1))
+            
+            title = cluster.name
+            
+            if len(not_labeled) > 0:
+                title += ' - not labeled: ' + ', '.join(not_labeled)
+            
+            if clusters_left > 0:
+                title += f' (clusters left to label: {clusters_left})'
+            
+            self._fig.suptitle(title)
+            self._fig.canvas.draw_idle()
+
+
+
+        def _show_label(self, radiobtn, label) -> None:
+            if label != -1:
+                radiobtn.set_active(label)
+            else:
+                # Shows the first option without assigning it to the cluster entry,
+                # the title tells the entry is not labeled yet.
+                radiobtn.eventson = False
+                radiobtn.set_active(0)
+                radiobtn.eventson = True